@@ -3,26 +3,78 @@
 Align two protein structures and save the aligned version
 """
 
+import importlib.util
+import mmap
+import re
 import sys
 import os
 import numpy as np
 
+# Matches a whole ATOM record line (without its newline)
+ATOM_LINE_RE = re.compile(rb'^ATOM[^\n]*', re.MULTILINE)
+
+# Numba's np.linalg support is backed by SciPy's LAPACK bindings. numba is
+# optional and only imported when kabsch_and_apply is first called
+numba_is_installed = (
+    importlib.util.find_spec("numba") is not None
+    and importlib.util.find_spec("scipy") is not None
+)
+_kabsch_and_apply_kernel = None
+
+def _parse_atom_coords(atom_lines):
+    """Parse the fixed-width coordinate columns of ATOM lines into an Nx3 array"""
+    # One conversion over all lines instead of per-line float(); records that
+    # stop before column 54 are padded so every slice stays 24 bytes wide
+    fields = b''.join(l.rstrip(b'\r\n')[30:54].ljust(24) for l in atom_lines)
+    try:
+        coords = np.frombuffer(fields, dtype='S8').astype(np.float64)
+    except ValueError:
+        for line in atom_lines:
+            try:
+                [float(line[i:i + 8]) for i in (30, 38, 46)]
+            except ValueError:
+                raise ValueError(f"Invalid coordinates in PDB record: {line!r}")
+        raise
+    return coords.reshape(-1, 3)
+
+def load_pdb(pdb_file):
+    """
+    Read PDB file once and parse all ATOM coordinates
+    Returns: list of lines, indices of ATOM lines, ATOM coordinates (Nx3)
+    and indices of CA atoms into the coordinate array
+    """
+    with open(pdb_file, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    
+    atom_indices = [i for i, line in enumerate(lines) if line[:4] == b'ATOM']
+    atom_lines = [lines[i] for i in atom_indices]
+    coords = _parse_atom_coords(atom_lines)
+    ca_indices = np.array([i for i, l in enumerate(atom_lines)
+                           if l[12:16].strip() == b'CA'], dtype=np.intp)
+    
+    return lines, atom_indices, coords, ca_indices
+
+def iter_atom_lines(pdb_file):
+    """Yield ATOM lines of a PDB file as bytes, read through a memory map"""
+    with open(pdb_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            # The regex scans the whole mapping in C; only ATOM lines are
+            # copied out
+            for match in ATOM_LINE_RE.finditer(buf):
+                yield match.group()
+
 def parse_pdb_coords(pdb_file):
     """Extract CA coordinates from PDB file"""
-    coords = []
-    residues = []
-    
-    with open(pdb_file, 'r') as f:
-        for line in f:
-            if line.startswith('ATOM') and line[12:16].strip() == 'CA':
-                x = float(line[30:38])
-                y = float(line[38:46])
-                z = float(line[46:54])
-                res_num = int(line[22:26])
-                coords.append([x, y, z])
-                residues.append(res_num)
-    
-    return np.array(coords), residues
+    ca_lines = [line for line in iter_atom_lines(pdb_file)
+                if line[12:16].strip() == b'CA']
+    
+    coords = _parse_atom_coords(ca_lines)
+    residues = np.frombuffer(b''.join(l[22:26] for l in ca_lines), dtype='S4')
+    residues = residues.astype(int).tolist()
+    
+    return coords, residues
 
 def kabsch_alignment(P, Q):
     """
@@ -41,49 +93,175 @@ def kabsch_alignment(P, Q):
     # Compute cross-covariance matrix
     H = P_centered.T @ Q_centered
     
-    # SVD
-    U, S, Vt = np.linalg.svd(H)
-    
-    # Compute rotation matrix
-    R = Vt.T @ U.T
+    # Horn's quaternion method: the optimal rotation is the eigenvector of
+    # the largest eigenvalue of a symmetric 4x4 matrix built from H, which
+    # avoids the LAPACK SVD call and always yields a proper rotation
+    Sxx, Sxy, Sxz = H[0]
+    Syx, Syy, Syz = H[1]
+    Szx, Szy, Szz = H[2]
+    N = np.array([
+        [Sxx + Syy + Szz, Syz - Szy, Szx - Sxz, Sxy - Syx],
+        [Syz - Szy, Sxx - Syy - Szz, Sxy + Syx, Szx + Sxz],
+        [Szx - Sxz, Sxy + Syx, -Sxx + Syy - Szz, Syz + Szy],
+        [Sxy - Syx, Szx + Sxz, Syz + Szy, -Sxx - Syy + Szz],
+    ])
+    _, eigvecs = np.linalg.eigh(N)
+    q0, qx, qy, qz = eigvecs[:, -1]
     
-    # Ensure proper rotation (det(R) = 1)
-    if np.linalg.det(R) < 0:
-        Vt[-1, :] *= -1
-        R = Vt.T @ U.T
+    # Compute rotation matrix from the unit quaternion
+    R = np.array([
+        [q0*q0 + qx*qx - qy*qy - qz*qz, 2*(qx*qy - q0*qz), 2*(qx*qz + q0*qy)],
+        [2*(qy*qx + q0*qz), q0*q0 - qx*qx + qy*qy - qz*qz, 2*(qy*qz - q0*qx)],
+        [2*(qz*qx - q0*qy), 2*(qz*qy + q0*qx), q0*q0 - qx*qx - qy*qy + qz*qz],
+    ])
     
     # Compute translation
     t = centroid_Q - R @ centroid_P
     
     return R, t
 
-def apply_transformation(pdb_file, output_file, R, t):
-    """Apply rotation and translation to all atoms in PDB file"""
-    
-    with open(pdb_file, 'r') as f:
-        lines = f.readlines()
-    
-    with open(output_file, 'w') as f:
-        for line in lines:
-            if line.startswith('ATOM'):
-                # Extract coordinates
-                x = float(line[30:38])
-                y = float(line[38:46])
-                z = float(line[46:54])
-                
-                # Apply transformation
-                coord = np.array([x, y, z])
-                new_coord = R @ coord + t
-                
-                # Replace coordinates in line
-                new_line = (line[:30] + 
-                           f"{new_coord[0]:8.3f}" + 
-                           f"{new_coord[1]:8.3f}" + 
-                           f"{new_coord[2]:8.3f}" + 
-                           line[54:])
-                f.write(new_line)
-            else:
-                f.write(line)
+def _kabsch_and_apply_loops(coords_all, P, Q):
+    """Kabsch alignment and transform written as explicit loops for Numba"""
+    n = P.shape[0]
+    
+    # Centroids
+    centroid_P = np.zeros(3)
+    centroid_Q = np.zeros(3)
+    for i in range(n):
+        for k in range(3):
+            centroid_P[k] += P[i, k]
+            centroid_Q[k] += Q[i, k]
+    for k in range(3):
+        centroid_P[k] /= n
+        centroid_Q[k] /= n
+    
+    # Cross-covariance matrix
+    H = np.zeros((3, 3))
+    for i in range(n):
+        for j in range(3):
+            p = P[i, j] - centroid_P[j]
+            for k in range(3):
+                H[j, k] += p * (Q[i, k] - centroid_Q[k])
+    
+    U, S, Vt = np.linalg.svd(H)
+    
+    # R = Vt.T @ U.T
+    R = np.zeros((3, 3))
+    for j in range(3):
+        for k in range(3):
+            for m in range(3):
+                R[j, k] += Vt[m, j] * U[k, m]
+    
+    # Ensure proper rotation (det(R) = 1) by flipping the last singular vector
+    det = (R[0, 0] * (R[1, 1] * R[2, 2] - R[1, 2] * R[2, 1])
+           - R[0, 1] * (R[1, 0] * R[2, 2] - R[1, 2] * R[2, 0])
+           + R[0, 2] * (R[1, 0] * R[2, 1] - R[1, 1] * R[2, 0]))
+    if det < 0:
+        for j in range(3):
+            for k in range(3):
+                R[j, k] -= 2 * Vt[2, j] * U[k, 2]
+    
+    # Rotate about the mobile centroid and move onto the reference centroid
+    out = np.empty_like(coords_all)
+    for i in range(coords_all.shape[0]):
+        for j in range(3):
+            acc = centroid_Q[j]
+            for k in range(3):
+                acc += R[j, k] * (coords_all[i, k] - centroid_P[k])
+            out[i, j] = acc
+    
+    return out
+
+def _get_kabsch_and_apply_kernel():
+    """Compile the Numba kernel on first use"""
+    global _kabsch_and_apply_kernel
+    if _kabsch_and_apply_kernel is None:
+        import numba
+        _kabsch_and_apply_kernel = numba.njit(cache=True, fastmath=True)(
+            _kabsch_and_apply_loops
+        )
+    return _kabsch_and_apply_kernel
+
+def kabsch_and_apply(coords_mobile_all, coords_ca_mobile, coords_ca_ref):
+    """
+    Align mobile CA atoms onto reference CA atoms and transform all mobile atoms
+    Uses a compiled Numba kernel when numba is installed
+    Returns: transformed mobile coordinates (Nx3)
+    """
+    if numba_is_installed:
+        return _get_kabsch_and_apply_kernel()(
+            np.ascontiguousarray(coords_mobile_all, dtype=np.float64),
+            np.ascontiguousarray(coords_ca_mobile, dtype=np.float64),
+            np.ascontiguousarray(coords_ca_ref, dtype=np.float64),
+        )
+    
+    R, t = kabsch_alignment(coords_ca_mobile, coords_ca_ref)
+    return coords_mobile_all @ R.T + t
+
+def batch_align(mobiles, ref):
+    """
+    Kabsch-align a batch of structures onto one reference in a single pass
+    mobiles: coordinates to align (BxNx3)
+    ref: reference coordinates (Nx3)
+    Returns: aligned coordinates (BxNx3)
+    """
+    # Center all coordinate sets at once
+    ref_centroid = ref.mean(axis=0)
+    ref_c = ref - ref_centroid
+    mobiles_c = mobiles - mobiles.mean(axis=1, keepdims=True)
+    
+    # Batched cross-covariance matrices (Bx3x3) and SVD
+    H = np.matmul(np.swapaxes(mobiles_c, -1, -2), ref_c)
+    U, S, Vt = np.linalg.svd(H)
+    
+    V = np.swapaxes(Vt, -1, -2)
+    Ut = np.swapaxes(U, -1, -2)
+    
+    # Ensure proper rotations (det(R) = 1) without branching or rebuilding R:
+    # V @ diag(1, 1, sign) @ U.T differs from V @ U.T by a rank-1 term
+    R = np.matmul(V, Ut)
+    sign = np.where(np.linalg.det(R) < 0, -1.0, 1.0)
+    R += (sign - 1)[:, None, None] * V[:, :, 2:3] * Ut[:, 2:3, :]
+    
+    return np.matmul(mobiles_c, np.swapaxes(R, -1, -2)) + ref_centroid
+
+def apply_transformation(lines, output_file, R, t, atom_coord_array=None,
+                         atom_indices=None):
+    """
+    Apply rotation and translation to all atoms of already read PDB lines
+    lines: PDB lines as returned by load_pdb
+    atom_coord_array: parsed ATOM coordinates (Nx3), parsed from lines if None
+    atom_indices: indices of the ATOM lines, found from lines if None
+    """
+    if atom_indices is None:
+        atom_indices = [i for i, line in enumerate(lines) if line[:4] == b'ATOM']
+    if atom_coord_array is None:
+        atom_coord_array = _parse_atom_coords([lines[i] for i in atom_indices])
+    if len(atom_indices) != len(atom_coord_array):
+        raise ValueError(
+            f"Got {len(atom_coord_array)} coordinates for "
+            f"{len(atom_indices)} ATOM lines"
+        )
+    
+    # Transform every atom with one matrix product into a preallocated buffer;
+    # np.dot(out=...) needs C-contiguous float64 input and output
+    atom_coord_array = np.ascontiguousarray(atom_coord_array, dtype=np.float64)
+    new_coords = np.empty_like(atom_coord_array)
+    np.dot(atom_coord_array, np.ascontiguousarray(R.T), out=new_coords)
+    new_coords += t
+    
+    # Replace coordinates in ATOM lines, formatting each atom with a single
+    # bytes % operation and splicing without intermediate str objects
+    fmt = b"%8.3f%8.3f%8.3f"
+    out_lines = list(lines)
+    for i, (x, y, z) in zip(atom_indices, new_coords.tolist()):
+        line = lines[i]
+        # Keep the line ending of records that stop before column 54
+        rest = line[54:] or line[len(line.rstrip(b'\r\n')):]
+        out_lines[i] = b''.join((line[:30], fmt % (x, y, z), rest))
+    
+    with open(output_file, 'wb') as f:
+        f.write(b''.join(out_lines))
 
 def align_structures(mobile_pdb, reference_pdb, output_pdb=None):
     """Align mobile structure to reference structure"""
@@ -97,9 +275,11 @@ def align_structures(mobile_pdb, reference_pdb, output_pdb=None):
     print(f"   Reference: {reference_pdb}")
     print(f"   Output: {output_pdb}")
     
-    # Extract CA coordinates
-    mobile_coords, mobile_res = parse_pdb_coords(mobile_pdb)
-    ref_coords, ref_res = parse_pdb_coords(reference_pdb)
+    # Read each file once and take CA coordinates from all ATOM coordinates
+    mobile_lines, mobile_atoms, mobile_all, mobile_ca = load_pdb(mobile_pdb)
+    _, _, ref_all, ref_ca = load_pdb(reference_pdb)
+    mobile_coords = mobile_all[mobile_ca]
+    ref_coords = ref_all[ref_ca]
     
     print(f"📊 Structure info:")
     print(f"   Mobile CA atoms: {len(mobile_coords)}")
@@ -119,12 +299,16 @@ def align_structures(mobile_pdb, reference_pdb, output_pdb=None):
     
     # Calculate RMSD before alignment
     diff_before = mobile_coords - ref_coords
-    rmsd_before = np.sqrt(np.mean(np.sum(diff_before**2, axis=1)))
+    rmsd_before = np.sqrt(np.einsum('ij,ij->', diff_before, diff_before) / len(diff_before))
     
-    # Calculate RMSD after alignment
-    aligned_coords = (R @ mobile_coords.T).T + t
-    diff_after = aligned_coords - ref_coords
-    rmsd_after = np.sqrt(np.mean(np.sum(diff_after**2, axis=1)))
+    # Calculate RMSD after alignment, reusing one buffer for the difference
+    RT = np.ascontiguousarray(R.T)
+    aligned_coords = np.empty_like(mobile_coords)
+    np.dot(mobile_coords, RT, out=aligned_coords)
+    aligned_coords += t
+    diff_after = aligned_coords
+    diff_after -= ref_coords
+    rmsd_after = np.sqrt(np.einsum('ij,ij->', diff_after, diff_after) / len(diff_after))
     
     print(f"📐 Alignment results:")
     print(f"   RMSD before: {rmsd_before:.3f} Å")
@@ -132,7 +316,7 @@ def align_structures(mobile_pdb, reference_pdb, output_pdb=None):
     print(f"   Improvement: {rmsd_before - rmsd_after:.3f} Å")
     
     # Apply transformation to all atoms
-    apply_transformation(mobile_pdb, output_pdb, R, t)
+    apply_transformation(mobile_lines, output_pdb, R, t, mobile_all, mobile_atoms)
     
     print(f"✅ Aligned structure saved: {output_pdb}")
     return output_pdb
@@ -34,6 +34,10 @@ case "${1:-simple}" in
         echo "⚠️  Note: This test is still under development and may fail"
         python macos_tools/test_model_macos.py
         ;;
+    "align"|"a")
+        echo "🚀 Running structure alignment checks..."
+        python macos_tools/test_alignment.py
+        ;;
     "both"|"b")
         echo "🚀 Running both tests..."
         echo ""
@@ -49,6 +53,7 @@ case "${1:-simple}" in
         echo "Test types:"
         echo "  simple|s    Run simple model instantiation test (default)"
         echo "  full|f      Run full model forward pass tests"
+        echo "  align|a     Run structure alignment regression checks"
         echo "  both|b      Run both tests"
         echo "  help|h      Show this help message"
         echo ""
@@ -56,6 +61,7 @@ case "${1:-simple}" in
         echo "  $0          # Run simple test"
         echo "  $0 simple   # Run simple test"
         echo "  $0 full     # Run full test"
+        echo "  $0 align    # Run alignment checks"
         echo "  $0 both     # Run both tests"
         exit 0
         ;;
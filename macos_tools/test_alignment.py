@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Regression checks for the structure alignment helpers against SVD Kabsch
+"""
+
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add macos_tools to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import align_structures
+
+def svd_kabsch(P, Q):
+    """Reference SVD Kabsch alignment of P onto Q"""
+    centroid_P = P.mean(axis=0)
+    centroid_Q = Q.mean(axis=0)
+    H = (P - centroid_P).T @ (Q - centroid_Q)
+    U, S, Vt = np.linalg.svd(H)
+    if np.linalg.det(Vt.T @ U.T) < 0:
+        Vt[-1, :] *= -1
+    R = Vt.T @ U.T
+    return R, centroid_Q - R @ centroid_P
+
+def random_rotation(rng):
+    """Random proper rotation matrix"""
+    q, r = np.linalg.qr(rng.normal(size=(3, 3)))
+    q *= np.sign(np.diag(r))
+    if np.linalg.det(q) < 0:
+        q[:, 0] *= -1
+    return q
+
+class TestAlignment(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.cases = []
+        for i in range(50):
+            n = int(rng.integers(3, 60))
+            P = rng.normal(size=(n, 3)) * 10
+            if i % 3 == 0:
+                # Unrelated point sets
+                Q = rng.normal(size=(n, 3)) * 10
+            elif i % 3 == 1:
+                # Noisy rigid motion
+                Q = P @ random_rotation(rng).T + rng.normal(size=3) * 5
+                Q += rng.normal(size=(n, 3)) * 0.1
+            else:
+                # Mirror image, where the SVD solution needs the reflection fix
+                Q = P @ np.diag([1., 1., -1.]) @ random_rotation(rng).T
+            self.cases.append((P, Q))
+
+    def test_kabsch_alignment(self):
+        for P, Q in self.cases:
+            R, t = align_structures.kabsch_alignment(P, Q)
+            R_ref, t_ref = svd_kabsch(P, Q)
+            np.testing.assert_allclose(R, R_ref, atol=1e-8)
+            np.testing.assert_allclose(t, t_ref, atol=1e-7)
+            self.assertAlmostEqual(np.linalg.det(R), 1.0)
+
+    def _check_kabsch_and_apply(self):
+        rng = np.random.default_rng(1)
+        for P, Q in self.cases:
+            coords_all = rng.normal(size=(len(P) + 7, 3)) * 10
+            R_ref, t_ref = svd_kabsch(P, Q)
+            out = align_structures.kabsch_and_apply(coords_all, P, Q)
+            np.testing.assert_allclose(out, coords_all @ R_ref.T + t_ref, atol=1e-7)
+
+    def test_kabsch_and_apply(self):
+        self._check_kabsch_and_apply()
+
+    def test_kabsch_and_apply_numpy_fallback(self):
+        numba_is_installed = align_structures.numba_is_installed
+        align_structures.numba_is_installed = False
+        try:
+            self._check_kabsch_and_apply()
+        finally:
+            align_structures.numba_is_installed = numba_is_installed
+
+    def test_batch_align(self):
+        rng = np.random.default_rng(2)
+        n = 25
+        ref = rng.normal(size=(n, 3)) * 10
+        mobiles = np.stack([
+            ref @ random_rotation(rng).T + rng.normal(size=3),
+            ref @ np.diag([1., 1., -1.]) @ random_rotation(rng).T,
+            rng.normal(size=(n, 3)) * 10,
+            rng.normal(size=(n, 3)) * 10,
+        ])
+        out = align_structures.batch_align(mobiles, ref)
+        for mobile, aligned in zip(mobiles, out):
+            R_ref, t_ref = svd_kabsch(mobile, ref)
+            np.testing.assert_allclose(aligned, mobile @ R_ref.T + t_ref, atol=1e-7)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -3,6 +3,7 @@
 macOS-compatible version of model tests that use CPU/MPS instead of CUDA
 """
 
+import functools
 import torch
 import torch.nn as nn
 import unittest
@@ -28,11 +29,37 @@ def get_device():
     # else:
     #     return torch.device('cpu')
 
+def model_cache_enabled():
+    """Models are shared across tests unless TORCH_SKIP_MODEL_CACHE=1"""
+    return os.environ.get("TORCH_SKIP_MODEL_CACHE") != "1"
+
+@functools.lru_cache(maxsize=None)
+def build_model(config_name, no_blocks, device):
+    """Build a small AlphaFold model and its config on the given device"""
+    c = model_config(config_name)
+    c.model.evoformer_stack.no_blocks = no_blocks
+    c.model.evoformer_stack.blocks_per_ckpt = None  # don't want to set up
+    # deepspeed for this test
+
+    # Use CPU/MPS instead of CUDA
+    model = AlphaFold(c).to(device)
+    model.eval()
+    return c, model
+
 class TestModelMacOS(unittest.TestCase):
     def setUp(self):
         self.device = get_device()
         print(f"Using device: {self.device}")
 
+    def get_model(self, config_name, no_blocks):
+        """Return a (config, model) pair, shared across tests unless caching is off"""
+        if not model_cache_enabled():
+            return build_model.__wrapped__(config_name, no_blocks, self.device)
+        c, model = build_model(config_name, no_blocks, self.device)
+        model.zero_grad(set_to_none=True)
+        model.eval()
+        return c, model
+
     def test_dry_run_cpu_mps(self):
         """Test dry run using CPU or MPS instead of CUDA"""
         n_seq = 4
@@ -40,46 +67,47 @@ class TestModelMacOS(unittest.TestCase):
         n_templ = 2
         n_extra_seq = 8
 
-        c = model_config(consts.model)
-        c.model.evoformer_stack.no_blocks = 4  # no need to go overboard here
-        c.model.evoformer_stack.blocks_per_ckpt = None  # don't want to set up
-        # deepspeed for this test
-
-        # Use CPU/MPS instead of CUDA
-        model = AlphaFold(c).to(self.device)
-        model.eval()
+        c, model = self.get_model(consts.model, 4)
 
         batch = {}
-        tf = torch.randint(c.model.input_embedder.tf_dim - 1, size=(n_res,))
+        tf = torch.randint(
+            c.model.input_embedder.tf_dim - 1, size=(n_res,), device=self.device
+        )
         batch["target_feat"] = nn.functional.one_hot(
             tf, c.model.input_embedder.tf_dim
         ).float()
         batch["aatype"] = torch.argmax(batch["target_feat"], dim=-1)
-        batch["residue_index"] = torch.arange(n_res)
+        batch["residue_index"] = torch.arange(n_res, device=self.device)
 
-        batch["msa_feat"] = torch.rand((n_seq, n_res, c.model.input_embedder.msa_dim))
+        batch["msa_feat"] = torch.rand(
+            (n_seq, n_res, c.model.input_embedder.msa_dim), device=self.device
+        )
         t_feats = random_template_feats(n_templ, n_res)
-        batch.update({k: torch.tensor(v) for k, v in t_feats.items()})
+        batch.update({
+            k: torch.as_tensor(v, device=self.device) for k, v in t_feats.items()
+        })
         extra_feats = random_extra_msa_feats(n_extra_seq, n_res)
-        batch.update({k: torch.tensor(v) for k, v in extra_feats.items()})
+        batch.update({
+            k: torch.as_tensor(v, device=self.device) for k, v in extra_feats.items()
+        })
         
         # Add missing masks
-        batch["msa_mask"] = torch.randint(low=0, high=2, size=(n_seq, n_res)).float()
-        batch["seq_mask"] = torch.randint(low=0, high=2, size=(n_res,)).float()
+        batch["msa_mask"] = torch.randint(
+            low=0, high=2, size=(n_seq, n_res), device=self.device
+        ).float()
+        batch["seq_mask"] = torch.randint(
+            low=0, high=2, size=(n_res,), device=self.device
+        ).float()
         batch.update(data_transforms.make_atom14_masks(batch))
-        batch["no_recycling_iters"] = torch.tensor(2.)
+        batch["no_recycling_iters"] = torch.tensor(2., device=self.device)
 
-        # Add recycling dimensions
+        # Add recycling dimensions as a view of the on-device batch
         from openfold.utils.tensor_utils import tensor_tree_map
         add_recycling_dims = lambda t: (
             t.unsqueeze(-1).expand(*t.shape, c.data.common.max_recycling_iters)
         )
         batch = tensor_tree_map(add_recycling_dims, batch)
 
-        # Move batch to device
-        to_device = lambda t: t.to(self.device) if isinstance(t, torch.Tensor) else t
-        batch = tensor_tree_map(to_device, batch)
-
         with torch.no_grad():
             out = model(batch)
 
@@ -93,42 +121,42 @@ class TestModelMacOS(unittest.TestCase):
         n_templ = 2
         msa_dim = 49
 
-        c = model_config("seq_model_esm1b")
-        c.model.evoformer_stack.no_blocks = 2
-        c.model.evoformer_stack.blocks_per_ckpt = None
-        
-        # Use CPU/MPS instead of CUDA
-        model = AlphaFold(c).to(self.device)
-        model.eval()
+        c, model = self.get_model("seq_model_esm1b", 2)
 
         batch = {}
-        tf = torch.randint(c.model.preembedding_embedder.tf_dim - 1, size=(n_res,))
+        tf = torch.randint(
+            c.model.preembedding_embedder.tf_dim - 1, size=(n_res,), device=self.device
+        )
         batch["target_feat"] = nn.functional.one_hot(tf, c.model.preembedding_embedder.tf_dim).float()
         batch["aatype"] = torch.argmax(batch["target_feat"], dim=-1)
-        batch["residue_index"] = torch.arange(n_res)
-        batch["msa_feat"] = torch.rand((n_seq, n_res, msa_dim))
-        batch["seq_embedding"] = torch.rand((n_res, c.model.preembedding_embedder.preembedding_dim))
+        batch["residue_index"] = torch.arange(n_res, device=self.device)
+        batch["msa_feat"] = torch.rand((n_seq, n_res, msa_dim), device=self.device)
+        batch["seq_embedding"] = torch.rand(
+            (n_res, c.model.preembedding_embedder.preembedding_dim), device=self.device
+        )
 
         t_feats = random_template_feats(n_templ, n_res)
-        batch.update({k: torch.tensor(v) for k, v in t_feats.items()})
+        batch.update({
+            k: torch.as_tensor(v, device=self.device) for k, v in t_feats.items()
+        })
 
         # Add required masks
-        batch["msa_mask"] = torch.randint(low=0, high=2, size=(n_seq, n_res)).float()
-        batch["seq_mask"] = torch.randint(low=0, high=2, size=(n_res,)).float()
+        batch["msa_mask"] = torch.randint(
+            low=0, high=2, size=(n_seq, n_res), device=self.device
+        ).float()
+        batch["seq_mask"] = torch.randint(
+            low=0, high=2, size=(n_res,), device=self.device
+        ).float()
         batch.update(data_transforms.make_atom14_masks(batch))
-        batch["no_recycling_iters"] = torch.tensor(2.)
+        batch["no_recycling_iters"] = torch.tensor(2., device=self.device)
 
-        # Add recycling dimensions
+        # Add recycling dimensions as a view of the on-device batch
         from openfold.utils.tensor_utils import tensor_tree_map
         add_recycling_dims = lambda t: (
             t.unsqueeze(-1).expand(*t.shape, c.data.common.max_recycling_iters)
         )
         batch = tensor_tree_map(add_recycling_dims, batch)
 
-        # Move batch to device  
-        to_device = lambda t: t.to(self.device) if isinstance(t, torch.Tensor) else t
-        batch = tensor_tree_map(to_device, batch)
-
         with torch.no_grad():
             out = model(batch)
 
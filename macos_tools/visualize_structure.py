@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 """
-Visualize protein structure using py3Dmol in Jupyter or as standalone HTML
+Visualize protein structure as standalone HTML using 3Dmol.js
 """
 
 import sys
 import os
 
-def visualize_pdb_html(pdb_path, output_html=None, analysis=None):
-    """Create standalone HTML visualization of PDB structure"""
+# Add macos_tools to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from align_structures import iter_atom_lines
+
+def visualize_pdb_html(pdb_path, output_html=None, analysis=None, pdb_data=None):
+    """Create standalone HTML visualization of PDB structure, reusing already read PDB text if given"""
     
     # If no output path specified, create HTML next to the PDB file
     if output_html is None:
@@ -15,26 +20,14 @@ def visualize_pdb_html(pdb_path, output_html=None, analysis=None):
         pdb_name = os.path.splitext(os.path.basename(pdb_path))[0]
         output_html = os.path.join(pdb_dir, f"{pdb_name}_viewer.html")
     
-    try:
-        import py3Dmol
-    except ImportError:
-        print("Installing py3Dmol...")
-        os.system("pip install py3Dmol")
-        import py3Dmol
-    
-    # Read PDB file
-    with open(pdb_path, 'r') as f:
-        pdb_data = f.read()
+    # Read PDB file if not provided
+    if pdb_data is None:
+        with open(pdb_path, 'r') as f:
+            pdb_data = f.read()
     
     # Get analysis if not provided
     if analysis is None:
-        analysis = analyze_structure(pdb_path)
-    
-    # Create viewer
-    viewer = py3Dmol.view(width=800, height=600)
-    viewer.addModel(pdb_data, 'pdb')
-    viewer.setStyle({'cartoon': {'color': 'spectrum'}})
-    viewer.zoomTo()
+        analysis = analyze_structure(pdb_path, pdb_data)
     
     # Create enhanced HTML with protein details
     residue_list_str = ", ".join(analysis['residue_list'][:10]) + ("..." if len(analysis['residue_list']) > 10 else "")
@@ -104,6 +97,9 @@ def visualize_pdb_html(pdb_path, output_html=None, analysis=None):
             </div>
         </div>
         
+        <!-- Raw PDB text; non-JavaScript script blocks are not executed or parsed -->
+        <script type="text/plain" id="pdb-data">{pdb_data}</script>
+        
         <script>
             // Global viewer variable for button access
             let viewer;
@@ -114,7 +110,8 @@ def visualize_pdb_html(pdb_path, output_html=None, analysis=None):
                     defaultcolors: $3Dmol.rasmolElementColors
                 }});
                 
-                viewer.addModel(`{pdb_data}`, "pdb");
+                const pdb = document.getElementById("pdb-data").textContent;
+                viewer.addModel(pdb, "pdb");
                 viewer.setStyle({{"cartoon": {{"color": "spectrum"}}}});
                 viewer.zoomTo();
                 viewer.render();
@@ -172,24 +169,39 @@ def visualize_pdb_html(pdb_path, output_html=None, analysis=None):
     print(f"✅ Created {output_html}")
     print(f"🌐 Open in browser: open {output_html}")
 
-def analyze_structure(pdb_path):
-    """Basic structure analysis"""
-    with open(pdb_path, 'r') as f:
-        lines = f.readlines()
-    
-    atoms = [l for l in lines if l.startswith('ATOM')]
-    residues = set(l[17:20].strip() for l in atoms)
-    chains = set(l[21] for l in atoms)
+def analyze_structure(pdb_path, pdb_data=None):
+    """Basic structure analysis, reusing already read PDB text if given"""
+    if pdb_data is None:
+        lines = (line.decode() for line in iter_atom_lines(pdb_path))
+    else:
+        lines = pdb_data.splitlines()
+    
+    # Collect atom, residue and chain information in a single pass; only the
+    # unique residue names are stripped
+    atom_count = 0
+    ca_count = 0
+    res_names = set()
+    chains = set()
+    residue_ids = set()
+    for line in lines:
+        if line[:4] != 'ATOM':
+            continue
+        atom_count += 1
+        res_names.add(line[17:20])
+        chains.add(line[21])
+        residue_ids.add((line[21], line[22:26]))
+        if line[12:16].strip() == 'CA':
+            ca_count += 1
+    residues = set(name.strip() for name in res_names)
     
     # Count residues by chain
-    residue_count = len(set((l[21], l[22:26].strip()) for l in atoms))
+    residue_count = len(residue_ids)
     
-    # Get sequence length and composition
-    amino_acids = [l[17:20].strip() for l in atoms if l[12:16].strip() == 'CA']  # CA atoms only
-    sequence_length = len(amino_acids)
+    # Sequence length from CA atoms
+    sequence_length = ca_count
     
     analysis = {
-        'atoms': len(atoms),
+        'atoms': atom_count,
         'residue_types': len(residues),
         'chains': len(chains),
         'sequence_length': sequence_length,
@@ -214,6 +226,8 @@ if __name__ == "__main__":
         sys.exit(1)
     
     print(f"🧬 Processing: {pdb_file}")
-    analysis = analyze_structure(pdb_file)
+    with open(pdb_file, 'r') as f:
+        pdb_data = f.read()
+    analysis = analyze_structure(pdb_file, pdb_data)
     print()
-    visualize_pdb_html(pdb_file, analysis=analysis)
\ No newline at end of file
+    visualize_pdb_html(pdb_file, analysis=analysis, pdb_data=pdb_data)
\ No newline at end of file
@@ -91,14 +91,16 @@ class TestModel(unittest.TestCase):
             batch["sym_id"] = torch.ones(n_res)
             batch["extra_deletion_matrix"] = torch.randint(0, 2, size=(n_extra_seq, n_res))
 
+        to_cuda_device = lambda t: t.cuda()
+        batch = tensor_tree_map(to_cuda_device, batch)
+
+        # Expand after the device transfer so the recycling dimension stays
+        # a view instead of being materialized by the copy
         add_recycling_dims = lambda t: (
             t.unsqueeze(-1).expand(*t.shape, c.data.common.max_recycling_iters)
         )
         batch = tensor_tree_map(add_recycling_dims, batch)
 
-        to_cuda_device = lambda t: t.cuda()
-        batch = tensor_tree_map(to_cuda_device, batch)
-
         with torch.no_grad():
             out = model(batch)
 
@@ -131,14 +133,16 @@ class TestModel(unittest.TestCase):
         batch["msa_mask"] = torch.randint(low=0, high=2, size=(n_seq, n_res)).float()
 
         batch["no_recycling_iters"] = torch.tensor(2.)
+        to_cuda_device = lambda t: t.to(torch.device("cuda"))
+        batch = tensor_tree_map(to_cuda_device, batch)
+
+        # Expand after the device transfer so the recycling dimension stays
+        # a view instead of being materialized by the copy
         add_recycling_dims = lambda t: (
             t.unsqueeze(-1).expand(*t.shape, c.data.common.max_recycling_iters)
         )
         batch = tensor_tree_map(add_recycling_dims, batch)
 
-        to_cuda_device = lambda t: t.to(torch.device("cuda"))
-        batch = tensor_tree_map(to_cuda_device, batch)
-
         with torch.no_grad():
             out = model(batch)
 